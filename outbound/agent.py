@@ -1,10 +1,13 @@
 """Pipecat voice agent pipeline for outbound pizza ordering calls."""
 
+import asyncio
 import os
 
-from typing import Callable
+from typing import Callable, Final
 
+import aiohttp
 from deepgram import LiveOptions
+from google.genai.types import HttpOptions
 from loguru import logger
 
 from pipecat.adapters.schemas.function_schema import FunctionSchema
@@ -35,6 +38,166 @@ transfer_to_customer_tool = FunctionSchema(
     properties={},
     required=[],
 )
+_TRANSFER_TOOLS = [transfer_to_customer_tool]
+_TRANSFER_RESULT = {
+    "status": "transferred",
+    "message": (
+        "The customer is now speaking directly to the restaurant. "
+        "IMPORTANT: Stay completely silent. Do not say anything "
+        "for the rest of the call."
+    ),
+}
+
+# Static per-call configuration — built once at import instead of on every connect
+_PLIVO_AUTH_ID: Final[str] = os.getenv("PLIVO_AUTH_ID", "")
+_PLIVO_AUTH_TOKEN: Final[str] = os.getenv("PLIVO_AUTH_TOKEN", "")
+_DEEPGRAM_API_KEY: Final[str] = os.getenv("DEEPGRAM_API_KEY", "")
+_GOOGLE_API_KEY: Final[str] = os.getenv("GOOGLE_API_KEY", "")
+_ELEVENLABS_API_KEY: Final[str] = os.getenv("ELEVENLABS_API_KEY", "")
+_ELEVENLABS_VOICE_ID: Final[str] = os.getenv("ELEVENLABS_VOICE_ID", "21m00Tcm4TlvDq8ikWAM")
+
+_SERIALIZER_PARAMS = PlivoFrameSerializer.InputParams(
+    plivo_sample_rate=8000,
+    auto_hang_up=True,
+)
+
+_VAD_PARAMS = VADParams(
+    confidence=0.55,
+    start_secs=0.2,
+    stop_secs=0.5,
+    min_volume=0.5,
+)
+
+_LIVE_OPTIONS = LiveOptions(
+    encoding="linear16",
+    language="en",
+    model="nova-3-general",
+    channels=1,
+    interim_results=True,
+    smart_format=False,
+    punctuate=True,
+    # Finalize quickly at end of speech — Pipecat also sends Deepgram a
+    # finalize as soon as Silero reports the user stopped speaking.
+    endpointing=150,
+    no_delay=True,
+    filler_words=False,
+)
+
+# Each call runs Silero, μ-law conversion and three provider connections on
+# this worker's event loop; past a few dozen calls every call's latency
+# suffers, so refuse new calls instead. Scale out with more workers.
+_MAX_CALLS_PER_WORKER = int(os.getenv("MAX_CALLS_PER_WORKER", "25"))
+
+# Silero loads an ONNX session per analyzer, so keep a warmed-up one for every
+# call slot and lend one to each call instead of loading the model on the
+# connect path. Pipecat already pins each session to the CPU provider with one
+# intra/inter op thread, which is what a per-call, tiny-tensor model wants.
+_VAD_POOL_SIZE = int(os.getenv("VAD_POOL_SIZE", str(_MAX_CALLS_PER_WORKER)))
+
+
+def _new_vad_analyzer() -> SileroVADAnalyzer:
+    """Create a Silero analyzer and run one dummy inference to warm it up."""
+    analyzer = SileroVADAnalyzer(params=_VAD_PARAMS)
+    analyzer.set_sample_rate(8000)
+    analyzer.voice_confidence(bytes(analyzer.num_frames_required() * 2))
+    _reset_vad_analyzer(analyzer)
+    return analyzer
+
+
+def _reset_vad_analyzer(analyzer: SileroVADAnalyzer):
+    """Clear the model state, buffered audio and speech state left by a call."""
+    analyzer._model.reset_states()
+    analyzer._last_reset_time = 0
+    analyzer._vad_buffer = b""
+    analyzer._prev_volume = 0
+    analyzer.set_params(_VAD_PARAMS)
+
+
+_vad_pool: asyncio.Queue[SileroVADAnalyzer] = asyncio.Queue()
+for _ in range(_VAD_POOL_SIZE):
+    _vad_pool.put_nowait(_new_vad_analyzer())
+
+
+async def _acquire_vad_analyzer() -> SileroVADAnalyzer:
+    """Take a warmed analyzer from the pool, or build one if all are in use.
+
+    Extra analyzers are built in a thread so loading the model doesn't stall
+    the audio of calls already running on this loop.
+    """
+    try:
+        return _vad_pool.get_nowait()
+    except asyncio.QueueEmpty:
+        logger.warning("VAD pool exhausted — loading an extra Silero analyzer")
+        return await asyncio.to_thread(_new_vad_analyzer)
+
+
+def _release_vad_analyzer(analyzer: SileroVADAnalyzer):
+    """Reset an analyzer and return it to the pool (extras are dropped)."""
+    if _vad_pool.qsize() >= _VAD_POOL_SIZE:
+        return
+    try:
+        _reset_vad_analyzer(analyzer)
+    except Exception as e:
+        logger.warning(f"Dropping VAD analyzer that failed to reset: {e}")
+        return
+    _vad_pool.put_nowait(analyzer)
+
+
+_call_slots = asyncio.Semaphore(_MAX_CALLS_PER_WORKER)
+
+
+class CallCapacityError(RuntimeError):
+    """Raised by run_bot when every call slot on this worker is taken."""
+
+
+def at_capacity() -> bool:
+    """Whether this worker would refuse a new call right now.
+
+    Checked before dialling so a full worker never rings the restaurant.
+    """
+    return _call_slots.locked()
+
+
+async def _on_pipeline_started(task, frame):
+    logger.info("Pipeline started — agent is live on the call")
+
+
+async def _on_pipeline_finished(task, frame):
+    logger.info("Pipeline finished — call ended")
+
+
+# One aiohttp session per worker for Gemini requests, so every call reuses the
+# same pooled TLS connections. genai never closes a session it was handed.
+_gemini_session: aiohttp.ClientSession | None = None
+
+
+def _get_gemini_session() -> aiohttp.ClientSession:
+    """Return the worker-wide Gemini HTTP session, creating it on first use."""
+    global _gemini_session
+    if _gemini_session is None or _gemini_session.closed:
+        _gemini_session = aiohttp.ClientSession()
+    return _gemini_session
+
+
+async def close_http_sessions():
+    """Close the shared HTTP session(s); call on server shutdown."""
+    if _gemini_session is not None and not _gemini_session.closed:
+        await _gemini_session.close()
+
+
+async def _warm_up_llm(llm: GoogleLLMService):
+    """Open Gemini's HTTPS connection while the STT/TTS websockets connect.
+
+    Deepgram and ElevenLabs connect when the StartFrame reaches them, but
+    Gemini is only contacted on the first user turn. A cheap model lookup
+    gets its TLS handshake out of the way in parallel. It is a real request
+    on every call, even when the shared session already holds an open
+    connection.
+    """
+    try:
+        await llm._client.aio.models.get(model=llm.model_name)
+    except Exception as e:
+        logger.debug(f"Gemini warm-up failed: {e}")
 
 
 async def run_bot(
@@ -46,10 +209,35 @@ async def run_bot(
     on_transfer: Callable | None = None,
 ):
     """Create and run the Pipecat pipeline for a phone call."""
+    if at_capacity():
+        raise CallCapacityError(
+            f"Worker at capacity ({_MAX_CALLS_PER_WORKER} calls), refusing call {call_id}"
+        )
 
-    plivo_auth_id = os.getenv("PLIVO_AUTH_ID", "")
-    plivo_auth_token = os.getenv("PLIVO_AUTH_TOKEN", "")
+    async with _call_slots:
+        vad_analyzer = await _acquire_vad_analyzer()
+        try:
+            await _run_pipeline(
+                websocket,
+                stream_id,
+                call_id,
+                system_prompt,
+                on_transfer,
+                vad_analyzer,
+            )
+        finally:
+            _release_vad_analyzer(vad_analyzer)
 
+
+async def _run_pipeline(
+    websocket,
+    stream_id: str,
+    call_id: str,
+    system_prompt: str,
+    on_transfer: Callable | None,
+    vad_analyzer: SileroVADAnalyzer,
+):
+    """Build the STT → LLM → TTS pipeline around the call's websocket and run it."""
     transport = FastAPIWebsocketTransport(
         websocket=websocket,
         params=FastAPIWebsocketParams(
@@ -60,42 +248,25 @@ async def run_bot(
             serializer=PlivoFrameSerializer(
                 stream_id=stream_id,
                 call_id=call_id,
-                auth_id=plivo_auth_id,
-                auth_token=plivo_auth_token,
-                params=PlivoFrameSerializer.InputParams(
-                    plivo_sample_rate=8000,
-                    auto_hang_up=True,
-                ),
-            ),
-            vad_analyzer=SileroVADAnalyzer(
-                params=VADParams(
-                    confidence=0.7,
-                    start_secs=0.3,
-                    stop_secs=2.0,
-                    min_volume=0.5,
-                ),
+                auth_id=_PLIVO_AUTH_ID,
+                auth_token=_PLIVO_AUTH_TOKEN,
+                params=_SERIALIZER_PARAMS,
             ),
+            vad_analyzer=vad_analyzer,
         ),
     )
 
     stt = DeepgramSTTService(
-        api_key=os.getenv("DEEPGRAM_API_KEY", ""),
-        live_options=LiveOptions(
-            encoding="linear16",
-            language="en",
-            model="nova-3-general",
-            channels=1,
-            interim_results=True,
-            smart_format=False,
-            punctuate=True,
-        ),
+        api_key=_DEEPGRAM_API_KEY,
+        live_options=_LIVE_OPTIONS,
     )
 
     llm = GoogleLLMService(
-        api_key=os.getenv("GOOGLE_API_KEY", ""),
+        api_key=_GOOGLE_API_KEY,
         model="gemini-2.5-flash",
         system_instruction=system_prompt,
-        tools=[transfer_to_customer_tool] if on_transfer else [],
+        tools=_TRANSFER_TOOLS if on_transfer else [],
+        http_options=HttpOptions(aiohttp_client=_get_gemini_session()),
     )
 
     # Register transfer handler — bridges customer audio into the call
@@ -104,14 +275,7 @@ async def run_bot(
             logger.info(f"Transfer to customer requested (call_id={call_id})")
             try:
                 await on_transfer()
-                result = {
-                    "status": "transferred",
-                    "message": (
-                        "The customer is now speaking directly to the restaurant. "
-                        "IMPORTANT: Stay completely silent. Do not say anything "
-                        "for the rest of the call."
-                    ),
-                }
+                result = _TRANSFER_RESULT
             except Exception as e:
                 result = {"status": "error", "message": str(e)}
                 logger.error(f"Transfer failed: {e}")
@@ -124,10 +288,15 @@ async def run_bot(
         )
 
     tts = ElevenLabsTTSService(
-        api_key=os.getenv("ELEVENLABS_API_KEY", ""),
-        voice_id=os.getenv("ELEVENLABS_VOICE_ID", "21m00Tcm4TlvDq8ikWAM"),
+        api_key=_ELEVENLABS_API_KEY,
+        voice_id=_ELEVENLABS_VOICE_ID,
         sample_rate=8000,
-        model="eleven_turbo_v2_5",
+        model="eleven_flash_v2_5",
+        # Forward Gemini's text chunks as they stream instead of holding them
+        # until a sentence ends. auto_mode expects whole sentences, so turn it
+        # off and let ElevenLabs buffer the partial text by its chunk schedule.
+        aggregate_sentences=False,
+        params=ElevenLabsTTSService.InputParams(auto_mode=False),
     )
 
     context = OpenAILLMContext(
@@ -156,13 +325,12 @@ async def run_bot(
         ),
     )
 
-    @task.event_handler("on_pipeline_started")
-    async def on_pipeline_started(task, frame):
-        logger.info("Pipeline started — agent is live on the call")
-
-    @task.event_handler("on_pipeline_finished")
-    async def on_pipeline_finished(task, frame):
-        logger.info("Pipeline finished — call ended")
+    task.add_event_handler("on_pipeline_started", _on_pipeline_started)
+    task.add_event_handler("on_pipeline_finished", _on_pipeline_finished)
 
     runner = PipelineRunner(handle_sigint=False)
-    await runner.run(task)
+    warm_up = asyncio.create_task(_warm_up_llm(llm))
+    try:
+        await runner.run(task)
+    finally:
+        warm_up.cancel()
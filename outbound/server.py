@@ -1,11 +1,20 @@
 """FastAPI server for outbound pizza ordering calls with listen-in support."""
 
 import asyncio
+import binascii
+import functools
+import gc
 import json
 import os
+import re
+import secrets
 import ssl
-import uuid
+import sys
+import threading
+import time
+from collections import OrderedDict
 from pathlib import Path
+from typing import Final
 
 import certifi
 
@@ -13,32 +22,167 @@ import certifi
 # that open SSL connections (Deepgram, ElevenLabs, Google, etc.)
 os.environ.setdefault("SSL_CERT_FILE", certifi.where())
 
+from dotenv import load_dotenv
+
+# Load .env before importing modules that read configuration at import time
+load_dotenv()
+
+from loguru import logger
+
+# Write log records from a background thread so stderr I/O never blocks the
+# event loop between audio frames.
+logger.remove()
+logger.add(
+    sys.stderr,
+    level=os.getenv("LOG_LEVEL", "INFO"),
+    enqueue=True,
+    backtrace=False,
+    diagnose=False,
+)
+
 import aiohttp
 import plivo
-from dotenv import load_dotenv
 from fastapi import FastAPI, Request, WebSocket
 from fastapi.responses import JSONResponse, Response
 from fastapi.staticfiles import StaticFiles
-from loguru import logger
 
-from outbound.agent import run_bot
+from outbound.agent import CallCapacityError, at_capacity, close_http_sessions, run_bot
 from restaurant_lookup import normalize_phone_number, search_restaurant
-from utils import TeeWebSocket
+from utils import TeeWebSocket, media_payload
 
-load_dotenv()
+# Keep GC pauses off the audio path: move everything allocated at import
+# (SDKs, Pipecat, the pooled Silero models) out of the collector's reach and
+# raise the gen0 threshold so per-frame garbage rarely triggers a collection.
+gc.freeze()
+gc.set_threshold(100_000, 50, 10)
 
 # Load system prompt template from markdown file
 _PROMPT_PATH = Path(__file__).parent / "system_prompt.md"
 _SYSTEM_PROMPT_TEMPLATE = _PROMPT_PATH.read_text()
 
+
+@functools.lru_cache(maxsize=256)
+def _render_system_prompt(**fields: str) -> str:
+    """Fill in the prompt template; repeat orders reuse the rendered prompt."""
+    return _SYSTEM_PROMPT_TEMPLATE.format(**fields)
+
+
 # Resolve static directory relative to project root
 _BASE_DIR = Path(__file__).resolve().parent.parent
 _STATIC_DIR = _BASE_DIR / "static"
 
+# Built once; TLS context creation re-reads the CA bundle from disk
+_SSL_CTX = ssl.create_default_context(cafile=certifi.where())
+
+# Configuration, read once at import (after load_dotenv above)
+_PUBLIC_HOST: Final[str] = os.getenv("PUBLIC_HOST", "localhost:7860")
+_PLIVO_PHONE: Final[str] = os.getenv("PLIVO_PHONE_NUMBER", "")
+_PLIVO_AUTH_ID: Final[str] = os.getenv("PLIVO_AUTH_ID", "")
+_PLIVO_AUTH_TOKEN: Final[str] = os.getenv("PLIVO_AUTH_TOKEN", "")
+_GOOGLE_PLACES_API_KEY: Final[str] = os.getenv("GOOGLE_PLACES_API_KEY", "")
+
 app = FastAPI(title="Pizza Ordering Agent")
 
-# In-memory order tracking
-orders: dict = {}
+# In-memory order tracking, oldest first. Orders are dropped once they are
+# older than _ORDER_TTL_SECS or the store grows past _MAX_ORDERS.
+orders: OrderedDict[str, dict] = OrderedDict()
+_ORDER_TTL_SECS = 3600
+_MAX_ORDERS = 10_000
+
+
+def _prune_orders():
+    """Evict expired orders (and the oldest ones beyond the size cap)."""
+    now = time.monotonic()
+    while orders:
+        oldest = next(iter(orders.values()))
+        if len(orders) < _MAX_ORDERS and now - oldest["created_at"] < _ORDER_TTL_SECS:
+            break
+        orders.popitem(last=False)
+
+
+# RestClient keeps per-request failover state (base_uri, retry count) on the
+# instance, so it can't be shared across threads; each thread gets its own.
+_plivo_local = threading.local()
+
+
+def _plivo_client() -> plivo.RestClient:
+    """Return this thread's Plivo client (keeps its HTTPS connections alive)."""
+    client = getattr(_plivo_local, "client", None)
+    if client is None:
+        client = _plivo_local.client = plivo.RestClient(
+            _PLIVO_AUTH_ID,
+            _PLIVO_AUTH_TOKEN,
+        )
+    return client
+
+
+# The Plivo SDK is blocking (requests under the hood); run its API calls in a
+# worker thread so webhooks and audio WebSockets keep flowing meanwhile.
+async def _plivo_create_call(**kwargs):
+    return await asyncio.to_thread(lambda: _plivo_client().calls.create(**kwargs))
+
+
+async def _plivo_hangup(call_uuid: str):
+    return await asyncio.to_thread(lambda: _plivo_client().calls.hangup(call_uuid))
+
+
+async def _plivo_cancel_call(request_uuid: str):
+    return await asyncio.to_thread(lambda: _plivo_client().calls.cancel(request_uuid))
+
+
+async def _call_listener(order_id: str, user_phone: str):
+    """Dial the user who listens in; the restaurant is called once they answer."""
+    return await _plivo_create_call(
+        from_=_PLIVO_PHONE,
+        to_=normalize_phone_number(user_phone),
+        answer_url=f"https://{_PUBLIC_HOST}/plivo/answer-listener?order_id={order_id}",
+        answer_method="GET",
+        hangup_url=f"https://{_PUBLIC_HOST}/plivo/hangup-listener?order_id={order_id}",
+        hangup_method="POST",
+    )
+
+
+async def _cancel_listener_call(listener_call: asyncio.Task):
+    """Cancel a listener call dialled for an order that could not proceed."""
+    try:
+        call = await listener_call
+    except Exception:
+        return
+    try:
+        await _plivo_cancel_call(call["request_uuid"])
+        logger.info(f"Listener call {call['request_uuid']} cancelled")
+    except Exception as e:
+        logger.warning(f"Failed to cancel listener call: {e}")
+
+
+# Plivo's stream start event is a small, fixed shape; pull the two ids out
+# directly instead of building the full dict for every call.
+_STREAM_ID_RE = re.compile(r'"streamId"\s*:\s*"([^"]*)"')
+_CALL_ID_RE = re.compile(r'"callId"\s*:\s*"([^"]*)"')
+
+
+def _parse_start_event(message: str) -> tuple[str, str]:
+    """Return (stream_id, call_id) from a Plivo WebSocket start event."""
+    stream_id = _STREAM_ID_RE.search(message)
+    call_id = _CALL_ID_RE.search(message)
+    return (
+        stream_id.group(1) if stream_id else secrets.token_hex(4),
+        call_id.group(1) if call_id else "",
+    )
+
+
+@app.on_event("startup")
+async def startup():
+    # Shared session so Places lookups reuse pooled keep-alive connections
+    app.state.http = aiohttp.ClientSession(
+        connector=aiohttp.TCPConnector(ssl=_SSL_CTX, limit=100, ttl_dns_cache=300)
+    )
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    await app.state.http.close()
+    await close_http_sessions()
 
 
 @app.get("/health")
@@ -72,8 +216,16 @@ async def start_order(request: Request):
             content={"error": "restaurant_query and order_items are required"},
         )
 
-    order_id = str(uuid.uuid4())[:8]
-    orders[order_id] = {
+    if at_capacity():
+        return JSONResponse(
+            status_code=503,
+            content={"error": "All lines are busy, please try again shortly"},
+        )
+
+    order_id = secrets.token_hex(4)
+    _prune_orders()
+    orders[order_id] = order = {
+        "created_at": time.monotonic(),
         "status": "searching",
         "restaurant": None,
         "recording_url": None,
@@ -85,88 +237,87 @@ async def start_order(request: Request):
         "listener_ws": None,
         "listener_stream_id": None,
         "tee_ws": None,
+        # Set once the restaurant lookup finishes (restaurant stays None on
+        # failure); the user can answer before that and must wait for it.
+        "restaurant_ready": asyncio.Event(),
     }
 
+    # --- Listen-in flow: start ringing the user while the restaurant is
+    # resolved, hiding the Plivo round-trip behind the Places lookup ---
+    listener_call = None
+    if user_phone:
+        listener_call = asyncio.create_task(_call_listener(order_id, user_phone))
+
     # --- Resolve restaurant phone number ---
     if phone_override:
         restaurant_name = restaurant_query or "Restaurant"
         phone_number = normalize_phone_number(phone_override)
-        orders[order_id]["restaurant"] = {
+        order["restaurant"] = {
             "name": restaurant_name,
             "address": "",
             "phone_number": phone_number,
         }
     else:
         try:
-            ssl_ctx = ssl.create_default_context(cafile=certifi.where())
-            async with aiohttp.ClientSession(
-                connector=aiohttp.TCPConnector(ssl=ssl_ctx)
-            ) as session:
-                restaurant = await search_restaurant(
-                    session,
-                    restaurant_query,
-                    os.getenv("GOOGLE_PLACES_API_KEY", ""),
-                )
+            restaurant = await search_restaurant(
+                request.app.state.http,
+                restaurant_query,
+                _GOOGLE_PLACES_API_KEY,
+            )
         except Exception as e:
-            orders[order_id]["status"] = "error"
+            order["status"] = "error"
+            order["restaurant_ready"].set()
             logger.error(f"Restaurant search failed: {e}")
+            if listener_call:
+                await _cancel_listener_call(listener_call)
             return JSONResponse(
                 status_code=500,
                 content={"error": f"Restaurant search failed: {str(e)}"},
             )
 
         if not restaurant:
-            orders[order_id]["status"] = "error"
+            order["status"] = "error"
+            order["restaurant_ready"].set()
+            if listener_call:
+                await _cancel_listener_call(listener_call)
             return JSONResponse(
                 status_code=404,
                 content={"error": "No restaurant found with a phone number"},
             )
 
-        orders[order_id]["restaurant"] = {
+        order["restaurant"] = {
             "name": restaurant.name,
             "address": restaurant.address,
             "phone_number": restaurant.phone_number,
         }
 
     # --- Build system prompt ---
-    restaurant_name = orders[order_id]["restaurant"]["name"]
-    system_prompt = _SYSTEM_PROMPT_TEMPLATE.format(
-        restaurant_name=restaurant_name,
-        order_items=order_items,
-        payment_method=payment_method,
-        customer_name=customer_name,
-        order_type=order_type,
-        delivery_address=delivery_address,
-        special_instructions=special_instructions,
+    restaurant_name = order["restaurant"]["name"]
+    system_prompt = _render_system_prompt(
+        restaurant_name=str(restaurant_name),
+        order_items=str(order_items),
+        payment_method=str(payment_method),
+        customer_name=str(customer_name),
+        order_type=str(order_type),
+        delivery_address=str(delivery_address),
+        special_instructions=str(special_instructions),
     )
-    orders[order_id]["system_prompt"] = system_prompt
+    order["system_prompt"] = system_prompt
+    order["restaurant_ready"].set()
 
-    public_host = os.getenv("PUBLIC_HOST", "localhost:7860")
-    plivo_auth_id = os.getenv("PLIVO_AUTH_ID", "")
-    plivo_auth_token = os.getenv("PLIVO_AUTH_TOKEN", "")
-    plivo_phone = os.getenv("PLIVO_PHONE_NUMBER", "")
-    client = plivo.RestClient(plivo_auth_id, plivo_auth_token)
-
-    # --- Listen-in flow: call the user first ---
-    if user_phone:
-        user_phone_norm = normalize_phone_number(user_phone)
-        orders[order_id]["status"] = "calling_listener"
+    # --- Listen-in flow: wait for the user call to be placed ---
+    if listener_call:
+        if order["status"] == "searching":
+            order["status"] = "calling_listener"
 
         try:
-            call = client.calls.create(
-                from_=plivo_phone,
-                to_=user_phone_norm,
-                answer_url=f"https://{public_host}/plivo/answer-listener?order_id={order_id}",
-                answer_method="GET",
-                hangup_url=f"https://{public_host}/plivo/hangup-listener?order_id={order_id}",
-                hangup_method="POST",
-            )
-            orders[order_id]["listener_call_uuid"] = call["request_uuid"]
+            call = await listener_call
+            order["listener_call_uuid"] = call["request_uuid"]
             logger.info(
-                f"Listener call initiated: {call['request_uuid']} to {user_phone_norm}"
+                f"Listener call initiated: {call['request_uuid']} to {user_phone}"
             )
         except Exception as e:
-            orders[order_id]["status"] = "error"
+            order["status"] = "error"
             logger.error(f"Listener call failed: {e}")
             return JSONResponse(
                 status_code=500,
@@ -176,29 +327,30 @@ async def start_order(request: Request):
         return JSONResponse(
             content={
                 "order_id": order_id,
-                "restaurant": orders[order_id]["restaurant"],
-                "status": "calling_listener",
+                "restaurant": order["restaurant"],
+                "status": order["status"],
             }
         )
 
     # --- Direct flow: call restaurant immediately ---
-    orders[order_id]["status"] = "calling"
+    order["status"] = "calling"
+    phone_number = order["restaurant"]["phone_number"]
 
     try:
-        call = client.calls.create(
-            from_=plivo_phone,
-            to_=orders[order_id]["restaurant"]["phone_number"],
-            answer_url=f"https://{public_host}/plivo/answer?order_id={order_id}",
+        call = await _plivo_create_call(
+            from_=_PLIVO_PHONE,
+            to_=phone_number,
+            answer_url=f"https://{_PUBLIC_HOST}/plivo/answer?order_id={order_id}",
             answer_method="GET",
-            hangup_url=f"https://{public_host}/plivo/hangup?order_id={order_id}",
+            hangup_url=f"https://{_PUBLIC_HOST}/plivo/hangup?order_id={order_id}",
             hangup_method="POST",
         )
-        orders[order_id]["call_uuid"] = call["request_uuid"]
+        order["call_uuid"] = call["request_uuid"]
         logger.info(
-            f"Call initiated: {call['request_uuid']} to {orders[order_id]['restaurant']['phone_number']}"
+            f"Call initiated: {call['request_uuid']} to {phone_number}"
         )
     except Exception as e:
-        orders[order_id]["status"] = "error"
+        order["status"] = "error"
         logger.error(f"Plivo call failed: {e}")
         return JSONResponse(
             status_code=500,
@@ -208,7 +360,7 @@ async def start_order(request: Request):
     return JSONResponse(
         content={
             "order_id": order_id,
-            "restaurant": orders[order_id]["restaurant"],
+            "restaurant": order["restaurant"],
             "status": "calling",
         }
     )
@@ -224,31 +376,26 @@ async def plivo_answer_listener(request: Request):
     """Plivo answer webhook for the listener (user) call."""
     order_id = request.query_params.get("order_id", "")
     call_uuid = request.query_params.get("CallUUID", "")
-    public_host = os.getenv("PUBLIC_HOST", "localhost:7860")
 
     logger.info(f"Listener answered for order {order_id}, CallUUID: {call_uuid}")
 
-    if order_id in orders:
-        orders[order_id]["listener_call_uuid"] = call_uuid
-
-    # Start recording the listener call
-    try:
-        plivo_auth_id = os.getenv("PLIVO_AUTH_ID", "")
-        plivo_auth_token = os.getenv("PLIVO_AUTH_TOKEN", "")
-        client = plivo.RestClient(plivo_auth_id, plivo_auth_token)
-        client.calls.start_recording(
-            call_uuid=call_uuid,
-            time_limit=600,
-            callback_url=f"https://{public_host}/plivo/recording-callback-listener?order_id={order_id}",
-            callback_method="POST",
-        )
-        logger.info(f"Listener recording started for call {call_uuid}")
-    except Exception as e:
-        logger.error(f"Failed to start listener recording: {e}")
+    order = orders.get(order_id)
+    if order is not None:
+        order["listener_call_uuid"] = call_uuid
 
-    ws_url = f"wss://{public_host}/plivo/ws-listener?order_id={order_id}"
+    ws_url = f"wss://{_PUBLIC_HOST}/plivo/ws-listener?order_id={order_id}"
 
     response = plivo.plivoxml.ResponseElement()
+    # Record the whole call in the background from the answer XML, which
+    # saves a separate start_recording API round-trip
+    response.add(
+        plivo.plivoxml.RecordElement(
+            record_session=True,
+            max_length=600,
+            callback_url=f"https://{_PUBLIC_HOST}/plivo/recording-callback-listener?order_id={order_id}",
+            callback_method="POST",
+        )
+    )
     response.add(
         plivo.plivoxml.SpeakElement(
             "Connecting you as a listener. You will hear the conversation shortly."
@@ -279,13 +426,8 @@ async def plivo_ws_listener(websocket: WebSocket):
     # Read the initial start event
     try:
         initial_msg = await asyncio.wait_for(websocket.receive_text(), timeout=10)
-        data = json.loads(initial_msg)
-        logger.info(f"Listener WS start event: {data}")
-
-        if data.get("event") == "start":
-            stream_id = data.get("start", {}).get("streamId", "")
-        else:
-            stream_id = data.get("streamId", str(uuid.uuid4())[:8])
+        logger.info(f"Listener WS start event: {initial_msg}")
+        stream_id, _ = _parse_start_event(initial_msg)
     except asyncio.TimeoutError:
         logger.error("Timeout waiting for listener start event")
         await websocket.close()
@@ -298,62 +440,78 @@ async def plivo_ws_listener(websocket: WebSocket):
     logger.info(f"Listener stream started: stream_id={stream_id}")
 
     # Store listener WS in order state
-    if order_id in orders:
-        orders[order_id]["listener_ws"] = websocket
-        orders[order_id]["listener_stream_id"] = stream_id
-        orders[order_id]["status"] = "listener_connected"
+    order = orders.get(order_id)
+    if order is not None:
+        order["listener_ws"] = websocket
+        order["listener_stream_id"] = stream_id
+        order["status"] = "listener_connected"
 
     # Trigger the restaurant call in the background
     asyncio.create_task(_call_restaurant(order_id))
 
-    # Keep connection alive — forward listener audio when bridge mode is active
+    # Keep connection alive — forward listener audio when bridge mode is active.
+    # Until the customer is bridged in, frames are dropped without parsing.
     try:
         while True:
             msg = await websocket.receive()
+            if msg["type"] == "websocket.disconnect":
+                break
             text = msg.get("text")
-            if not text:
+            tee_ws = order.get("tee_ws") if order is not None else None
+            if not text or tee_ws is None or not tee_ws.bridge_enabled:
                 continue
             try:
-                data = json.loads(text)
-                if data.get("event") == "media":
-                    payload = data.get("media", {}).get("payload", "")
-                    if payload and order_id in orders:
-                        tee_ws = orders[order_id].get("tee_ws")
-                        if tee_ws and hasattr(tee_ws, "feed_bridge_audio"):
-                            import base64
-                            tee_ws.feed_bridge_audio(base64.b64decode(payload))
-            except (json.JSONDecodeError, Exception):
+                payload = media_payload(text, "media")
+                if payload:
+                    tee_ws.feed_bridge_audio(binascii.a2b_base64(payload))
+            except Exception:
                 pass
     except Exception:
         pass
     finally:
-        if order_id in orders:
-            orders[order_id].pop("listener_ws", None)
+        if order is not None:
+            order.pop("listener_ws", None)
         logger.info(f"Listener WebSocket closed for order {order_id}")
 
 
+async def _abort_listen_in(order: dict):
+    """Mark a listen-in order failed and hang up the user's call."""
+    order["status"] = "error"
+    listener_uuid = order.get("listener_call_uuid")
+    if listener_uuid:
+        try:
+            await _plivo_hangup(listener_uuid)
+        except Exception as e:
+            logger.warning(f"Failed to hang up listener call: {e}")
+
+
 async def _call_restaurant(order_id: str):
     """Initiate the Plivo call to the restaurant (called after listener connects)."""
     order = orders.get(order_id)
     if not order:
         return
 
-    restaurant_phone = order["restaurant"]["phone_number"]
-    public_host = os.getenv("PUBLIC_HOST", "localhost:7860")
-    plivo_auth_id = os.getenv("PLIVO_AUTH_ID", "")
-    plivo_auth_token = os.getenv("PLIVO_AUTH_TOKEN", "")
-    plivo_phone = os.getenv("PLIVO_PHONE_NUMBER", "")
+    await order["restaurant_ready"].wait()
+    if order["restaurant"] is None:
+        logger.error(f"Restaurant lookup failed for order {order_id}, hanging up listener")
+        await _abort_listen_in(order)
+        return
+
+    if at_capacity():
+        logger.error(f"Worker at capacity, not calling restaurant for order {order_id}")
+        await _abort_listen_in(order)
+        return
 
-    client = plivo.RestClient(plivo_auth_id, plivo_auth_token)
+    restaurant_phone = order["restaurant"]["phone_number"]
 
     try:
         order["status"] = "calling"
-        call = client.calls.create(
-            from_=plivo_phone,
+        call = await _plivo_create_call(
+            from_=_PLIVO_PHONE,
             to_=restaurant_phone,
-            answer_url=f"https://{public_host}/plivo/answer?order_id={order_id}",
+            answer_url=f"https://{_PUBLIC_HOST}/plivo/answer?order_id={order_id}",
             answer_method="GET",
-            hangup_url=f"https://{public_host}/plivo/hangup?order_id={order_id}",
+            hangup_url=f"https://{_PUBLIC_HOST}/plivo/hangup?order_id={order_id}",
             hangup_method="POST",
         )
         order["call_uuid"] = call["request_uuid"]
@@ -371,9 +529,10 @@ async def plivo_hangup_listener(request: Request):
     order_id = request.query_params.get("order_id", "")
     logger.info(f"Listener hung up for order {order_id}")
 
-    if order_id in orders:
-        orders[order_id].pop("listener_ws", None)
-        orders[order_id]["listener_call_uuid"] = None
+    order = orders.get(order_id)
+    if order is not None:
+        order.pop("listener_ws", None)
+        order["listener_call_uuid"] = None
 
     return JSONResponse(content={"status": "ok"})
 
@@ -382,36 +541,12 @@ async def plivo_hangup_listener(request: Request):
 async def plivo_recording_callback_listener(request: Request):
     """Plivo recording callback for the listener call."""
     order_id = request.query_params.get("order_id", "")
-    recording_url = ""
-    try:
-        form_data = await request.form()
-        form_dict = dict(form_data)
-        logger.info(f"Listener recording callback: {form_dict}")
-        recording_url = form_dict.get("RecordUrl", "") or form_dict.get("RecordingUrl", "") or form_dict.get("record_url", "")
-        if not recording_url and "response" in form_dict:
-            try:
-                nested = json.loads(form_dict["response"])
-                recording_url = nested.get("record_url", "") or nested.get("RecordUrl", "") or nested.get("recording_url", "")
-            except (json.JSONDecodeError, TypeError):
-                pass
-    except Exception:
-        pass
-    if not recording_url:
-        try:
-            body = await request.json()
-            recording_url = body.get("RecordUrl", "") or body.get("RecordingUrl", "") or body.get("record_url", "")
-            if not recording_url and "response" in body:
-                try:
-                    nested = json.loads(body["response"]) if isinstance(body["response"], str) else body["response"]
-                    recording_url = nested.get("record_url", "") or nested.get("RecordUrl", "") or nested.get("recording_url", "")
-                except (json.JSONDecodeError, TypeError):
-                    pass
-        except Exception:
-            pass
+    recording_url = await _parse_recording_url(request)
 
     logger.info(f"Listener recording for order {order_id}: url={recording_url}")
-    if order_id in orders and recording_url:
-        orders[order_id]["listener_recording_url"] = recording_url
+    order = orders.get(order_id)
+    if order is not None and recording_url:
+        order["listener_recording_url"] = recording_url
     return JSONResponse(content={"status": "ok"})
 
 
@@ -425,32 +560,25 @@ async def plivo_answer(request: Request):
     """Plivo answer webhook — returns Stream XML to connect WebSocket."""
     order_id = request.query_params.get("order_id", "")
     call_uuid = request.query_params.get("CallUUID", "")
-    public_host = os.getenv("PUBLIC_HOST", "localhost:7860")
 
     logger.info(f"Call answered for order {order_id}, CallUUID: {call_uuid}")
 
-    if order_id in orders:
-        orders[order_id]["status"] = "in_progress"
-        orders[order_id]["call_uuid"] = call_uuid
-
-    # Start recording via Plivo API
-    try:
-        plivo_auth_id = os.getenv("PLIVO_AUTH_ID", "")
-        plivo_auth_token = os.getenv("PLIVO_AUTH_TOKEN", "")
-        client = plivo.RestClient(plivo_auth_id, plivo_auth_token)
-        client.calls.start_recording(
-            call_uuid=call_uuid,
-            time_limit=600,
-            callback_url=f"https://{public_host}/plivo/recording-callback?order_id={order_id}",
-            callback_method="POST",
-        )
-        logger.info(f"Recording started for call {call_uuid}")
-    except Exception as e:
-        logger.error(f"Failed to start recording: {e}")
+    order = orders.get(order_id)
+    if order is not None:
+        order["status"] = "in_progress"
+        order["call_uuid"] = call_uuid
 
     # Build Plivo XML response with bidirectional Stream
-    ws_url = f"wss://{public_host}/plivo/ws?order_id={order_id}"
+    ws_url = f"wss://{_PUBLIC_HOST}/plivo/ws?order_id={order_id}"
     response = plivo.plivoxml.ResponseElement()
+    response.add(
+        plivo.plivoxml.RecordElement(
+            record_session=True,
+            max_length=600,
+            callback_url=f"https://{_PUBLIC_HOST}/plivo/recording-callback?order_id={order_id}",
+            callback_method="POST",
+        )
+    )
     response.add(
         plivo.plivoxml.StreamElement(
             content=ws_url,
@@ -476,15 +604,8 @@ async def plivo_websocket(websocket: WebSocket):
     # Read the initial 'start' event from Plivo to get stream_id and call_id
     try:
         initial_msg = await asyncio.wait_for(websocket.receive_text(), timeout=10)
-        data = json.loads(initial_msg)
-        logger.info(f"Plivo WS start event: {data}")
-
-        if data.get("event") == "start":
-            stream_id = data.get("start", {}).get("streamId", "")
-            call_id = data.get("start", {}).get("callId", "")
-        else:
-            stream_id = data.get("streamId", str(uuid.uuid4())[:8])
-            call_id = data.get("callId", "")
+        logger.info(f"Plivo WS start event: {initial_msg}")
+        stream_id, call_id = _parse_start_event(initial_msg)
     except asyncio.TimeoutError:
         logger.error("Timeout waiting for Plivo start event")
         await websocket.close()
@@ -497,15 +618,16 @@ async def plivo_websocket(websocket: WebSocket):
     logger.info(f"Stream started: stream_id={stream_id}, call_id={call_id}")
 
     # Wrap with TeeWebSocket if a listener is connected
-    order_data = orders.get(order_id, {})
+    order = orders.get(order_id)
+    order_data = order if order is not None else {}
     listener_ws = order_data.get("listener_ws")
     listener_stream_id = order_data.get("listener_stream_id", "")
     on_transfer = None
     if listener_ws:
         logger.info(f"Wrapping WebSocket with TeeWebSocket for listener (stream_id={listener_stream_id})")
         ws_for_bot = TeeWebSocket(websocket, listener_ws, listener_stream_id)
-        if order_id in orders:
-            orders[order_id]["tee_ws"] = ws_for_bot
+        if order is not None:
+            order["tee_ws"] = ws_for_bot
 
         async def on_transfer():
             ws_for_bot.enable_bridge()
@@ -517,6 +639,7 @@ async def plivo_websocket(websocket: WebSocket):
     order_type = order_data.get("order_type", "pickup")
 
     # Run the Pipecat bot pipeline
+    refused = False
     try:
         await run_bot(
             websocket=ws_for_bot,
@@ -526,11 +649,25 @@ async def plivo_websocket(websocket: WebSocket):
             order_type=order_type,
             on_transfer=on_transfer,
         )
+    except CallCapacityError as e:
+        refused = True
+        logger.error(str(e))
+        if order is not None:
+            order["status"] = "error"
+        try:
+            await _plivo_hangup(call_id)
+        except Exception as e:
+            logger.warning(f"Failed to hang up refused call: {e}")
+        await websocket.close()
     except Exception as e:
         logger.error(f"Bot pipeline error: {e}")
     finally:
-        if order_id in orders:
-            orders[order_id]["status"] = "completed"
+        if order is not None:
+            # Keep status and recordings for the UI; drop per-call state
+            if not refused:
+                order["status"] = "completed"
+            order.pop("tee_ws", None)
+            order.pop("system_prompt", None)
         logger.info(f"WebSocket closed for order {order_id}")
 
 
@@ -538,17 +675,16 @@ async def plivo_websocket(websocket: WebSocket):
 async def plivo_hangup(request: Request):
     """Plivo hangup webhook — update order status and end listener call."""
     order_id = request.query_params.get("order_id", "")
-    if order_id in orders:
-        orders[order_id]["status"] = "completed"
+    order = orders.get(order_id)
+    if order is not None:
+        if order["status"] != "error":
+            order["status"] = "completed"
 
         # Also hang up the listener call if active
-        listener_uuid = orders[order_id].get("listener_call_uuid")
+        listener_uuid = order.get("listener_call_uuid")
         if listener_uuid:
             try:
-                plivo_auth_id = os.getenv("PLIVO_AUTH_ID", "")
-                plivo_auth_token = os.getenv("PLIVO_AUTH_TOKEN", "")
-                client = plivo.RestClient(plivo_auth_id, plivo_auth_token)
-                client.calls.hangup(listener_uuid)
+                await _plivo_hangup(listener_uuid)
                 logger.info(f"Listener call {listener_uuid} hung up")
             except Exception as e:
                 logger.warning(f"Failed to hang up listener call: {e}")
@@ -562,44 +698,63 @@ async def plivo_hangup(request: Request):
 # ---------------------------------------------------------------------------
 
 
+_RECORDING_URL_KEYS = ("RecordUrl", "RecordingUrl", "record_url", "recording_url")
+
+
 def _extract_recording_url(form_dict: dict) -> str:
     """Extract recording URL from Plivo callback data."""
-    url = form_dict.get("RecordUrl", "") or form_dict.get("RecordingUrl", "") or form_dict.get("record_url", "")
-    if not url and "response" in form_dict:
+    for key in _RECORDING_URL_KEYS:
+        url = form_dict.get(key)
+        if url:
+            return url
+    nested = form_dict.get("response")
+    if nested:
         try:
-            nested = json.loads(form_dict["response"]) if isinstance(form_dict["response"], str) else form_dict["response"]
-            url = nested.get("record_url", "") or nested.get("RecordUrl", "") or nested.get("recording_url", "")
-        except (json.JSONDecodeError, TypeError):
+            if isinstance(nested, str):
+                nested = json.loads(nested)
+            for key in _RECORDING_URL_KEYS:
+                url = nested.get(key)
+                if url:
+                    return url
+        except (json.JSONDecodeError, TypeError, AttributeError):
             pass
-    return url
+    return ""
 
 
-@app.post("/plivo/recording-callback")
-async def plivo_recording_callback(request: Request):
-    """Plivo recording callback — store the recording URL."""
-    order_id = request.query_params.get("order_id", "")
-    recording_url = ""
+async def _parse_recording_url(request: Request) -> str:
+    """Read a recording callback body (form, else JSON) and return its URL."""
+    # JSON bodies go straight to the JSON parser; only form bodies without a
+    # URL fall through to a second parse.
+    is_json = request.headers.get("content-type", "").startswith("application/json")
+    if not is_json:
+        try:
+            form_dict = dict(await request.form())
+            logger.info(f"Recording callback form data: {form_dict}")
+            url = _extract_recording_url(form_dict)
+            if url:
+                return url
+        except Exception:
+            pass
 
     try:
-        form_data = await request.form()
-        form_dict = dict(form_data)
-        logger.info(f"Recording callback form data: {form_dict}")
-        recording_url = _extract_recording_url(form_dict)
+        body = await request.json()
+        logger.info(f"Recording callback JSON body: {body}")
+        return _extract_recording_url(body)
     except Exception:
-        pass
+        return ""
 
-    if not recording_url:
-        try:
-            body = await request.json()
-            logger.info(f"Recording callback JSON body: {body}")
-            recording_url = _extract_recording_url(body)
-        except Exception:
-            pass
+
+@app.post("/plivo/recording-callback")
+async def plivo_recording_callback(request: Request):
+    """Plivo recording callback — store the recording URL."""
+    order_id = request.query_params.get("order_id", "")
+    recording_url = await _parse_recording_url(request)
 
     logger.info(f"Recording callback for order {order_id}: recording_url={recording_url}")
 
-    if order_id in orders and recording_url:
-        orders[order_id]["recording_url"] = recording_url
+    order = orders.get(order_id)
+    if order is not None and recording_url:
+        order["recording_url"] = recording_url
 
     return JSONResponse(content={"status": "ok"})
 
@@ -607,10 +762,11 @@ async def plivo_recording_callback(request: Request):
 @app.get("/recording/{order_id}")
 async def get_recording(order_id: str):
     """Return the recording URLs for an order."""
-    if order_id not in orders:
+    order = orders.get(order_id)
+    if order is None:
         return JSONResponse(status_code=404, content={"error": "Order not found"})
-    recording_url = orders[order_id].get("recording_url")
-    listener_recording_url = orders[order_id].get("listener_recording_url")
+    recording_url = order.get("recording_url")
+    listener_recording_url = order.get("listener_recording_url")
     if not recording_url and not listener_recording_url:
         return JSONResponse(status_code=404, content={"error": "Recording not available yet"})
     return JSONResponse(content={
@@ -622,9 +778,9 @@ async def get_recording(order_id: str):
 @app.get("/order/{order_id}")
 async def get_order(order_id: str):
     """Return the current status of an order."""
-    if order_id not in orders:
+    order = orders.get(order_id)
+    if order is None:
         return JSONResponse(status_code=404, content={"error": "Order not found"})
-    order = orders[order_id]
     return JSONResponse(content={
         "order_id": order_id,
         "status": order["status"],
@@ -634,5 +790,7 @@ async def get_order(order_id: str):
     })
 
 
-# Serve static files (web UI) — must be last so it doesn't override API routes
-app.mount("/", StaticFiles(directory=str(_STATIC_DIR), html=True), name="static")
+# Serve static files (web UI) — must be last so it doesn't override API routes.
+# Set SERVE_STATIC=0 when a reverse proxy serves the UI instead.
+if os.getenv("SERVE_STATIC", "1") == "1":
+    app.mount("/", StaticFiles(directory=str(_STATIC_DIR), html=True), name="static")
@@ -6,6 +6,8 @@ from typing import Optional
 import aiohttp
 import certifi
 
+_NON_DIGITS = re.compile(r"\D+")
+
 
 @dataclass
 class RestaurantInfo:
@@ -17,7 +19,7 @@ class RestaurantInfo:
 
 def normalize_phone_number(phone: str) -> str:
     """Convert any phone format to E.164 (+15551234567) for Plivo."""
-    digits = re.sub(r"[^\d]", "", phone)
+    digits = _NON_DIGITS.sub("", phone)
     if len(digits) == 10:
         digits = "1" + digits
     if len(digits) == 11 and digits.startswith("1"):
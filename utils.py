@@ -1,9 +1,11 @@
 """Audio utilities — mulaw mixing and TeeWebSocket for listen-in feature."""
 
 import asyncio
-import base64
+import binascii
 import json
+import re
 
+import numpy as np
 from fastapi import WebSocket
 from loguru import logger
 
@@ -12,45 +14,95 @@ from loguru import logger
 # Mulaw codec — decode/encode μ-law for real-time audio mixing
 # ---------------------------------------------------------------------------
 
-# Decode table: mulaw byte → 16-bit linear PCM
-_ULAW_DECODE = []
-for _i in range(256):
-    _u = ~_i & 0xFF
-    _sign = _u & 0x80
-    _exp = (_u >> 4) & 0x07
-    _man = _u & 0x0F
-    _s = ((_man << 3) + 0x84) << _exp
-    _s -= 0x84
-    _ULAW_DECODE.append(-_s if _sign else _s)
-
-
-def _linear_to_ulaw(pcm: int) -> int:
-    """Encode a single 16-bit PCM sample to a mulaw byte."""
+def _ulaw_to_linear(u: np.ndarray) -> np.ndarray:
+    """Decode mulaw bytes to 16-bit PCM samples."""
+    u = ~u.astype(np.int32) & 0xFF
+    s = (((u & 0x0F) << 3) + 0x84) << ((u >> 4) & 0x07)
+    s -= 0x84
+    return np.where(u & 0x80, -s, s).astype(np.int16)
+
+
+def _linear_to_ulaw(pcm: np.ndarray) -> np.ndarray:
+    """Encode 16-bit PCM samples to mulaw bytes."""
     BIAS = 0x84
-    sign = 0
-    if pcm < 0:
-        sign = 0x80
-        pcm = -pcm
-    pcm = min(pcm, 0x7FFF) + BIAS
-    exp = 7
-    mask = 0x4000
-    while exp > 0 and not (pcm & mask):
-        exp -= 1
-        mask >>= 1
+    CLIP = 0x7FFF - BIAS  # keeps the biased magnitude within 15 bits
+    pcm = pcm.astype(np.int32)
+    sign = np.where(pcm < 0, 0x80, 0)
+    pcm = np.minimum(np.abs(pcm), CLIP) + BIAS
+    # Segment is the position of the highest set bit above bit 7 (0..7);
+    # frexp's exponent is exactly the bit length
+    exp = np.frexp(pcm)[1] - 8
     mantissa = (pcm >> (exp + 3)) & 0x0F
-    return ~(sign | (exp << 4) | mantissa) & 0xFF
+    return (~(sign | (exp << 4) | mantissa) & 0xFF).astype(np.uint8)
+
+
+# Decode table: mulaw byte → 16-bit linear PCM
+_ULAW_DECODE = _ulaw_to_linear(np.arange(256))
+
+# Encode table: a 64K-entry gather indexed by the 16-bit two's-complement
+# sample (pcm & 0xFFFF)
+_ENCODE_LUT = _linear_to_ulaw(np.arange(0x10000, dtype=np.uint16).view(np.int16))
+
+# Each input is one byte, so a mixed sample has only 65536 possible inputs.
+# MIX_LUT[(a << 8) | b] holds the saturated, re-encoded sum of a and b, which
+# makes mixing a single gather from a 64 KB table.
+_MIX_LUT = _ENCODE_LUT[
+    np.clip(
+        _ULAW_DECODE.astype(np.int32)[:, None] + _ULAW_DECODE[None, :],
+        -32768,
+        32767,
+    ).ravel()
+    & 0xFFFF
+]
+
+# mulaw 0xFF decodes to 0, so it pads the shorter buffer with silence
+_ULAW_SILENCE = 0xFF
+
+
+def mix_mulaw(a: bytes, b: bytes, out: np.ndarray | None = None) -> bytes | memoryview:
+    """Mix two mulaw buffers sample-by-sample into one.
+
+    If ``out`` (a uint8 array at least as long as the longer input) is given,
+    the result is written into it and a memoryview of the mixed prefix is
+    returned instead of a new bytes object.
+    """
+    n = max(len(a), len(b))
+    # Pack each (a, b) pair into one little-endian uint16 lane: b in the low
+    # byte, a in the high byte. The view is the table index, with no shifts.
+    pairs = np.full(2 * n, _ULAW_SILENCE, dtype=np.uint8)
+    pairs[1 : 2 * len(a) : 2] = np.frombuffer(a, dtype=np.uint8)
+    pairs[0 : 2 * len(b) : 2] = np.frombuffer(b, dtype=np.uint8)
+    idx = pairs.view("<u2")
+    if out is None:
+        return _MIX_LUT[idx].tobytes()
+    mixed = out[:n]
+    np.take(_MIX_LUT, idx, out=mixed)
+    return mixed.data
+
+
+# ---------------------------------------------------------------------------
+# Plivo stream frames
+# ---------------------------------------------------------------------------
+
+# Media frames have a fixed shape, so the event name and payload are matched
+# directly rather than parsing the whole frame for every 20 ms of audio.
+_EVENT_RE = re.compile(r'"event"\s*:\s*"(\w+)"')
+_PAYLOAD_RE = re.compile(r'"payload"\s*:\s*"([A-Za-z0-9+/=]*)"')
 
 
-def mix_mulaw(a: bytes, b: bytes) -> bytes:
-    """Mix two mulaw buffers sample-by-sample into one."""
-    la, lb = len(a), len(b)
-    n = max(la, lb)
-    out = bytearray(n)
-    for i in range(n):
-        sa = _ULAW_DECODE[a[i]] if i < la else 0
-        sb = _ULAW_DECODE[b[i]] if i < lb else 0
-        out[i] = _linear_to_ulaw(max(-32768, min(32767, sa + sb)))
-    return bytes(out)
+def media_payload(text: str, event: str) -> str:
+    """Return the base64 payload of a Plivo ``event`` frame, else ""."""
+    match = _EVENT_RE.search(text)
+    if match is None or match.group(1) != event:
+        return ""
+    match = _PAYLOAD_RE.search(text)
+    if match is not None:
+        return match.group(1)
+    # Payload written in an unexpected form (e.g. escaped) — parse properly
+    try:
+        return json.loads(text).get("media", {}).get("payload", "")
+    except (json.JSONDecodeError, AttributeError):
+        return ""
 
 
 # ---------------------------------------------------------------------------
@@ -61,6 +113,21 @@ def mix_mulaw(a: bytes, b: bytes) -> bytes:
 TICK_MS = 100
 TICK_SAMPLES = 8000 * TICK_MS // 1000  # 800 bytes of mulaw per tick
 
+# playAudio frames only differ in their base64 payload (and streamId), so the
+# JSON around it is pre-rendered and the payload spliced in each tick.
+_PLAY_AUDIO_PREFIX = (
+    '{"event": "playAudio", "media": '
+    '{"contentType": "audio/x-mulaw", "sampleRate": 8000, "payload": "'
+)
+_PLAY_AUDIO_SUFFIX = '"}}'
+
+_SILENCE_TICK = bytes([_ULAW_SILENCE]) * TICK_SAMPLES
+
+
+def _is_silence(chunk: bytes) -> bool:
+    """True if ``chunk`` (at most one tick long) is all mulaw silence."""
+    return _SILENCE_TICK.startswith(chunk)
+
 
 class TeeWebSocket:
     """Proxy that quacks like a Starlette WebSocket.
@@ -78,6 +145,7 @@ class TeeWebSocket:
         self._ws = real_ws
         self._listener_ws = listener_ws
         self._listener_stream_id = listener_stream_id
+        self._listener_suffix = f'"}}, "streamId": {json.dumps(listener_stream_id)}}}'
         self._listener_alive = True
         # Separate buffers for each direction (raw mulaw bytes)
         self._inbound_buf = bytearray()   # restaurant voice
@@ -85,6 +153,8 @@ class TeeWebSocket:
         # Bridge mode: listener can speak to the restaurant
         self._bridge_mode = False
         self._bridge_buf = bytearray()    # listener voice → restaurant
+        # Reused every tick so mixing does not allocate an output buffer
+        self._mix_buf = np.empty(TICK_SAMPLES, dtype=np.uint8)
         self._sender_task = asyncio.create_task(self._sender_loop())
 
     # -- properties Pipecat reads ------------------------------------------
@@ -99,6 +169,10 @@ class TeeWebSocket:
 
     # -- bridge mode (let listener speak to restaurant) ---------------------
 
+    @property
+    def bridge_enabled(self) -> bool:
+        return self._bridge_mode
+
     def enable_bridge(self):
         """Enable bidirectional mode — listener audio goes to restaurant."""
         self._bridge_mode = True
@@ -114,27 +188,13 @@ class TeeWebSocket:
     async def receive(self):
         data = await self._ws.receive()
         if self._listener_alive and data.get("text"):
-            try:
-                msg = json.loads(data["text"])
-                if msg.get("event") == "media":
-                    payload = msg.get("media", {}).get("payload", "")
-                    if payload:
-                        self._inbound_buf.extend(base64.b64decode(payload))
-            except Exception:
-                pass
+            self._tap(data["text"], "media", self._inbound_buf)
         return data
 
     async def receive_text(self):
         text = await self._ws.receive_text()
         if self._listener_alive:
-            try:
-                msg = json.loads(text)
-                if msg.get("event") == "media":
-                    payload = msg.get("media", {}).get("payload", "")
-                    if payload:
-                        self._inbound_buf.extend(base64.b64decode(payload))
-            except Exception:
-                pass
+            self._tap(text, "media", self._inbound_buf)
         return text
 
     # -- send (outbound to restaurant, i.e. agent TTS) ---------------------
@@ -142,14 +202,21 @@ class TeeWebSocket:
     async def send_text(self, text: str):
         await self._ws.send_text(text)
         if self._listener_alive:
-            try:
-                msg = json.loads(text)
-                if msg.get("event") == "playAudio":
-                    payload = msg.get("media", {}).get("payload", "")
-                    if payload:
-                        self._outbound_buf.extend(base64.b64decode(payload))
-            except Exception:
-                pass
+            self._tap(text, "playAudio", self._outbound_buf)
+
+    @staticmethod
+    def _tap(text: str, event: str, buf: bytearray):
+        """Decode the audio of an ``event`` frame once and queue it in ``buf``.
+
+        The frame itself is passed on untouched; Pipecat's serializer decodes
+        its own copy from the text.
+        """
+        try:
+            payload = media_payload(text, event)
+            if payload:
+                buf.extend(binascii.a2b_base64(payload))
+        except Exception:
+            pass
 
     async def send_bytes(self, data: bytes):
         await self._ws.send_bytes(data)
@@ -163,52 +230,63 @@ class TeeWebSocket:
 
     async def _sender_loop(self):
         """Every TICK_MS, take up to TICK_SAMPLES from each buffer, mix, send."""
+        loop = asyncio.get_running_loop()
+        tick = TICK_MS / 1000
+        # Sleep until fixed deadlines rather than a fixed interval, so the time
+        # spent mixing and sending doesn't stretch each tick and let the
+        # listener stream fall behind real time.
+        deadline = loop.time()
         try:
             while True:
-                await asyncio.sleep(TICK_MS / 1000)
+                deadline += tick
+                delay = deadline - loop.time()
+                if delay < -tick:
+                    # Stalled for more than a tick; resync rather than burst
+                    deadline = loop.time()
+                    delay = 0
+                await asyncio.sleep(max(delay, 0))
                 if not self._listener_alive:
                     break
 
-                # Drain up to one tick's worth from each buffer
-                in_chunk = bytes(self._inbound_buf[:TICK_SAMPLES])
+                # Drain up to one tick's worth from each buffer. The slice is
+                # already a copy, so it is used as-is rather than re-copied
+                # into bytes.
+                in_chunk = self._inbound_buf[:TICK_SAMPLES]
                 del self._inbound_buf[:TICK_SAMPLES]
-                out_chunk = bytes(self._outbound_buf[:TICK_SAMPLES])
+                out_chunk = self._outbound_buf[:TICK_SAMPLES]
                 del self._outbound_buf[:TICK_SAMPLES]
 
                 # Bridge mode: forward listener audio to restaurant
                 if self._bridge_mode:
-                    bridge_chunk = bytes(self._bridge_buf[:TICK_SAMPLES])
+                    bridge_chunk = self._bridge_buf[:TICK_SAMPLES]
                     del self._bridge_buf[:TICK_SAMPLES]
                     if bridge_chunk:
-                        bridge_b64 = base64.b64encode(bridge_chunk).decode("utf-8")
-                        await self._ws.send_text(json.dumps({
-                            "event": "playAudio",
-                            "media": {
-                                "contentType": "audio/x-mulaw",
-                                "sampleRate": 8000,
-                                "payload": bridge_b64,
-                            },
-                        }))
+                        bridge_b64 = binascii.b2a_base64(bridge_chunk, newline=False).decode("ascii")
+                        await self._ws.send_text(
+                            _PLAY_AUDIO_PREFIX + bridge_b64 + _PLAY_AUDIO_SUFFIX
+                        )
 
                 if not in_chunk and not out_chunk:
                     continue
 
-                # Mix both directions into one stream (or pass through single)
-                if in_chunk and out_chunk:
-                    mixed = mix_mulaw(in_chunk, out_chunk)
+                # Mix both directions into one stream (or pass through single).
+                # A side that is pure silence and no longer than the other
+                # adds nothing to the mix, so the other side passes through.
+                if not in_chunk or (
+                    len(in_chunk) <= len(out_chunk) and _is_silence(in_chunk)
+                ):
+                    mixed = out_chunk
+                elif not out_chunk or (
+                    len(out_chunk) <= len(in_chunk) and _is_silence(out_chunk)
+                ):
+                    mixed = in_chunk
                 else:
-                    mixed = in_chunk or out_chunk
-
-                payload_b64 = base64.b64encode(mixed).decode("utf-8")
-                await self._listener_ws.send_text(json.dumps({
-                    "event": "playAudio",
-                    "media": {
-                        "contentType": "audio/x-mulaw",
-                        "sampleRate": 8000,
-                        "payload": payload_b64,
-                    },
-                    "streamId": self._listener_stream_id,
-                }))
+                    mixed = mix_mulaw(in_chunk, out_chunk, out=self._mix_buf)
+
+                payload_b64 = binascii.b2a_base64(mixed, newline=False).decode("ascii")
+                await self._listener_ws.send_text(
+                    _PLAY_AUDIO_PREFIX + payload_b64 + self._listener_suffix
+                )
         except asyncio.CancelledError:
             pass
         except Exception as e: